@@ -5,89 +5,220 @@ Simulates the Android app workflow using extracted video frames
 """
 
 import os
+import random
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from PIL import Image
 import cv2
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Keyword set for analysis-type classification, in if/elif priority order.
+# Packed into fixed-width byte rows so the Numba kernel can scan them in
+# nopython mode; labels index into ContextInterpreter.ANALYSIS_LABELS.
+_KEYWORDS = [b'fastener', b'bolt', b'screw', b'weld', b'corrosion', b'rust', b'pipe', b'flange']
+_KEYWORD_LABELS = np.array([0, 0, 0, 1, 2, 2, 3, 3], dtype=np.int64)
+_KEYWORD_LENS = np.array([len(k) for k in _KEYWORDS], dtype=np.int64)
+_KEYWORD_BYTES = np.zeros((len(_KEYWORDS), int(_KEYWORD_LENS.max())), dtype=np.uint8)
+for _i, _kw in enumerate(_KEYWORDS):
+    _KEYWORD_BYTES[_i, :len(_kw)] = np.frombuffer(_kw, dtype=np.uint8)
+
+# Hyperscan compiles the keyword set to one caseless multi-pattern DFA, so a
+# response is classified in a single SIMD-accelerated pass instead of one
+# substring scan per keyword
+if HYPERSCAN_AVAILABLE:
+    _HS_DB = hyperscan.Database()
+    _HS_DB.compile(
+        expressions=_KEYWORDS,
+        ids=[int(label) for label in _KEYWORD_LABELS],
+        flags=[hyperscan.HS_FLAG_CASELESS] * len(_KEYWORDS)
+    )
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True)
+    def _classify_response(buf, keywords, keyword_lens, labels):
+        """
+        Single native-code pass over a lowercased byte buffer, returning the
+        lowest (highest-priority) matched label or 4 for no match
+        """
+        best = 4
+        for start in range(buf.size):
+            for k in range(keyword_lens.size):
+                length = keyword_lens[k]
+                if labels[k] >= best or start + length > buf.size:
+                    continue
+                match = True
+                for c in range(length):
+                    if buf[start + c] != keywords[k, c]:
+                        match = False
+                        break
+                if match:
+                    best = labels[k]
+        return best
+
+# Progressive prompts from the Android plan, in analysis order
+PROGRESSIVE_PROMPTS = [
+    "Describe the overall system or machine in this image.",
+    "Identify the main mechanical component in the center of the image.",
+    "Focus on the connection points. Are there bolts, welds, or clamps?",
+    "Describe the surface condition. Is there evidence of wear, corrosion, or damage?",
+    "Provide a summary of the component's likely function and condition."
+]
+
+# Canned mock responses, allocated exactly once at import - they are shared
+# by every MockLeapService instance and never mutated
+_RESPONSES = {
+    "overall": "This image shows a large industrial pipe flange assembly with multiple bolt connections. The system appears to be part of a pressure vessel or piping network with metallic components.",
+
+    "component": "The main component is a flanged pipe connection with approximately 8-12 bolts arranged in a circular pattern. The flange appears to be a raised-face type with gasket sealing surface.",
+
+    "connections": "The connection points consist of high-strength bolts with hex nuts, likely Grade 8 or similar. The bolts appear to be in tension loading configuration with visible thread engagement.",
+
+    "condition": "Surface shows signs of light corrosion and weathering typical of outdoor industrial environments. Some bolt heads show minor rust staining but no significant structural deterioration is visible.",
+
+    "summary": "This flanged connection appears to be functioning within normal parameters. The slight surface corrosion suggests routine maintenance inspection is recommended, particularly for gasket integrity and bolt torque verification."
+}
 
 class MockLeapService:
     """
     Mock implementation of the LEAP SDK service for desktop testing
     In the real Android app, this would use the actual LEAP SDK
     """
-    
-    def __init__(self):
+
+    # The mock sleeps release the GIL, so concurrent prompts genuinely
+    # overlap; a real LEAP binding serializing on one GPU context should
+    # advertise False here
+    supports_parallel = True
+
+    def __init__(self, virtual_time=False):
         self.initialized = False
         self.model_load_time = 0
-    
+        # virtual_time skips the real sleeps and reports drawn-from-
+        # distribution timings instead - the JSON output is equivalent but a
+        # 100-frame run finishes in under a second, which makes iterating on
+        # the downstream report logic (and running in CI) practical
+        self.virtual_time = virtual_time
+
+        # O(1) dispatch for the five known harness prompts; ad-hoc prompts
+        # fall back to the keyword scan in _generate_mock_response
+        self._prompt_to_key = dict(zip(
+            PROGRESSIVE_PROMPTS,
+            ["overall", "component", "connections", "condition", "summary"]
+        ))
+
     def initialize(self):
         """Simulate model loading"""
         print("🧠 Initializing LEAP SDK (Mock)...")
+        if self.virtual_time:
+            self.model_load_time = 2.5
+            self.initialized = True
+            print(f"✅ LEAP SDK Initialized in {self.model_load_time:.2f}s (virtual)")
+            return
+
         start_time = time.time()
-        
+
         # Simulate model loading time (2-5 seconds typical)
         time.sleep(2.5)
-        
+
         self.model_load_time = time.time() - start_time
         self.initialized = True
         print(f"✅ LEAP SDK Initialized in {self.model_load_time:.2f}s")
-    
-    def analyze_image(self, image_path, prompt):
+
+    def analyze_image(self, image, prompt):
         """
         Mock AI analysis - returns simulated engineering analysis
         In the real app, this would call the actual LEAP SDK
+
+        Accepts either a file path or an already-decoded image (PIL.Image or
+        numpy array). Real LEAP bindings take in-memory bitmaps/tensors, so
+        decoding once per frame and passing the buffer avoids re-decoding
+        the same JPEG for each of the five prompts.
         """
         if not self.initialized:
             return "Error: LEAP SDK not initialized", 0
-        
+
+        if self.virtual_time:
+            # Same 1.5s nominal inference time, drawn rather than slept
+            return self._generate_mock_response(prompt, image), random.gauss(1500, 150)
+
         start_time = time.time()
-        
+
         # Simulate inference time (1-3 seconds typical for mobile)
         time.sleep(1.5)
-        
+
         inference_time = time.time() - start_time
-        
+
         # Generate mock responses based on prompt type
-        mock_response = self._generate_mock_response(prompt, image_path)
-        
+        mock_response = self._generate_mock_response(prompt, image)
+
         return mock_response, inference_time * 1000  # Convert to milliseconds
     
-    def _generate_mock_response(self, prompt, image_path):
+    def _generate_mock_response(self, prompt, image):
         """Generate realistic mock responses for different prompt types"""
-        responses = {
-            "overall": "This image shows a large industrial pipe flange assembly with multiple bolt connections. The system appears to be part of a pressure vessel or piping network with metallic components.",
-            
-            "component": "The main component is a flanged pipe connection with approximately 8-12 bolts arranged in a circular pattern. The flange appears to be a raised-face type with gasket sealing surface.",
-            
-            "connections": "The connection points consist of high-strength bolts with hex nuts, likely Grade 8 or similar. The bolts appear to be in tension loading configuration with visible thread engagement.",
-            
-            "condition": "Surface shows signs of light corrosion and weathering typical of outdoor industrial environments. Some bolt heads show minor rust staining but no significant structural deterioration is visible.",
-            
-            "summary": "This flanged connection appears to be functioning within normal parameters. The slight surface corrosion suggests routine maintenance inspection is recommended, particularly for gasket integrity and bolt torque verification."
-        }
-        
-        # Map prompt keywords to responses
-        if "overall" in prompt.lower() or "system" in prompt.lower():
-            return responses["overall"]
-        elif "component" in prompt.lower() or "mechanical" in prompt.lower():
-            return responses["component"] 
-        elif "connection" in prompt.lower() or "bolts" in prompt.lower():
-            return responses["connections"]
-        elif "surface" in prompt.lower() or "condition" in prompt.lower():
-            return responses["condition"]
-        elif "summary" in prompt.lower() or "function" in prompt.lower():
-            return responses["summary"]
+        # O(1) dispatch for the known harness prompts
+        key = self._prompt_to_key.get(prompt)
+        if key is not None:
+            return _RESPONSES[key]
+
+        # Keyword fallback for prompts outside the standard progressive set
+        lowered = prompt.lower()
+        if "overall" in lowered or "system" in lowered:
+            return _RESPONSES["overall"]
+        elif "component" in lowered or "mechanical" in lowered:
+            return _RESPONSES["component"]
+        elif "connection" in lowered or "bolts" in lowered:
+            return _RESPONSES["connections"]
+        elif "surface" in lowered or "condition" in lowered:
+            return _RESPONSES["condition"]
+        elif "summary" in lowered or "function" in lowered:
+            return _RESPONSES["summary"]
         else:
             return "Unable to analyze this aspect of the component."
 
 class ContextInterpreter:
     """Context interpretation logic from the Android plan"""
-    
+
+    # Indexed by the labels in _KEYWORD_LABELS; 4 means no keyword matched
+    ANALYSIS_LABELS = [
+        "Fatigue Analysis, Stress Concentration",
+        "Crack Propagation, Residual Stress Analysis",
+        "Remaining Life Assessment, Material Degradation Study",
+        "Fluid Dynamics, Pressure Drop Analysis",
+        "General Structural Analysis"
+    ]
+
     @staticmethod
     def get_analysis_type(ai_response):
+        if HYPERSCAN_AVAILABLE:
+            # One DFA pass; min() over matched ids preserves the if/elif
+            # priority order, and CASELESS removes the .lower() allocation
+            matched = []
+            _HS_DB.scan(ai_response.encode(),
+                        match_event_handler=lambda pat_id, start, end, flags, ctx: matched.append(pat_id))
+            label = min(matched) if matched else 4
+            return ContextInterpreter.ANALYSIS_LABELS[label]
+
         lowercased_response = ai_response.lower()
-        
+
+        if NUMBA_AVAILABLE:
+            buf = np.frombuffer(lowercased_response.encode(), dtype=np.uint8)
+            label = _classify_response(buf, _KEYWORD_BYTES, _KEYWORD_LENS, _KEYWORD_LABELS)
+            return ContextInterpreter.ANALYSIS_LABELS[label]
+
         if any(word in lowercased_response for word in ["fastener", "bolt", "screw"]):
             return "Fatigue Analysis, Stress Concentration"
         elif "weld" in lowercased_response:
@@ -123,49 +254,77 @@ class QuestionGenerator:
     
     @staticmethod
     def generate_question(analysis_type):
-        # Find matching question by checking if analysis type contains key
-        for key, question_data in QuestionGenerator.questions_map.items():
-            if key.split(",")[0].strip() in analysis_type:
-                return question_data
-        return None
+        # get_analysis_type returns one of the full questions_map keys, so a
+        # direct lookup suffices; unmapped types (General Structural
+        # Analysis) return None as before
+        return QuestionGenerator.questions_map.get(analysis_type)
 
-def run_progressive_analysis_test():
+def iter_extracted_frames(frames_dir):
+    """
+    Yield (frame_path, frame_name, timestamp) for each extracted frame
+
+    Prefers the frames.jsonl manifest streamed by extract_frames.py, reading
+    it line by line in extraction order; falls back to a directory listing
+    for frame sets extracted before the manifest existed.
+    """
+    manifest_path = os.path.join(frames_dir, 'frames.jsonl')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest:
+            for line in manifest:
+                entry = json.loads(line)
+                frame_path = entry['filepath']
+                yield frame_path, os.path.basename(frame_path), f"{entry['timestamp']:.1f}s"
+    else:
+        # os.scandir yields DirEntry objects without stat-ing or building the
+        # full listing up front; only the matching .jpg names get sorted
+        # (directory enumeration order is not guaranteed by the filesystem)
+        with os.scandir(frames_dir) as entries:
+            frame_files = sorted(e.name for e in entries if e.name.endswith('.jpg'))
+        for frame_file in frame_files:
+            timestamp = frame_file.split('_t')[1].split('s.jpg')[0] + 's'
+            yield os.path.join(frames_dir, frame_file), frame_file, timestamp
+
+def run_progressive_analysis_test(virtual_time=False):
     """Main test function - simulates the full Android workflow"""
-    
+
     print("SimSpec Progressive Analysis Test Harness")
     print("=" * 50)
-    
+
     # Initialize mock LEAP service
-    leap_service = MockLeapService()
+    leap_service = MockLeapService(virtual_time=virtual_time)
     leap_service.initialize()
     
     # Progressive prompts from the Android plan
-    prompts = [
-        "Describe the overall system or machine in this image.",
-        "Identify the main mechanical component in the center of the image.",
-        "Focus on the connection points. Are there bolts, welds, or clamps?", 
-        "Describe the surface condition. Is there evidence of wear, corrosion, or damage?",
-        "Provide a summary of the component's likely function and condition."
-    ]
-    
+    prompts = PROGRESSIVE_PROMPTS
+
     # Get extracted frames
     frames_dir = "extracted_frames"
     if not os.path.exists(frames_dir):
         print(f"Error: {frames_dir} directory not found. Run extract_frames.py first.")
         return
     
-    frame_files = sorted([f for f in os.listdir(frames_dir) if f.endswith('.jpg')])
-    if not frame_files:
+    # Peek the frame iterator before touching the results file, so an empty
+    # frames directory doesn't truncate the previous run's results
+    frames = iter_extracted_frames(frames_dir)
+    try:
+        first_frame = next(frames)
+    except StopIteration:
         print(f"Error: No frame files found in {frames_dir}")
         return
-    
-    results = []
-    
+
+    # Stream one JSON line per frame as results are produced, so memory stays
+    # bounded and the report can parse line by line - no final indent=2 dump
+    results_file = "simspec_test_results.jsonl"
+    results_out = open(results_file, 'w')
+    results_out.write(json.dumps({
+        'model_load_time_s': leap_service.model_load_time,
+        'prompts_per_frame': len(prompts)
+    }) + '\n')
+
+    frames_analyzed = 0
+
     # Test each frame with progressive analysis
-    for frame_file in frame_files:
-        frame_path = os.path.join(frames_dir, frame_file)
-        timestamp = frame_file.split('_t')[1].split('s.jpg')[0] + 's'
-        
+    for frame_path, frame_file, timestamp in chain([first_frame], frames):
         print(f"\n🎯 Analyzing Frame: {frame_file} (Timestamp: {timestamp})")
         print("-" * 40)
         
@@ -175,11 +334,27 @@ def run_progressive_analysis_test():
             'analyses': []
         }
         
-        # Run all 5 progressive prompts on this frame
-        for i, prompt in enumerate(prompts):
+        # Decode the JPEG once and share the decoded image across all five
+        # prompts, instead of letting the service re-open the path per prompt
+        frame_image = Image.open(frame_path)
+        frame_image.load()  # force the decode up front
+
+        # Run all 5 progressive prompts on this frame. When the service can
+        # handle concurrent requests, issue them together so per-frame
+        # latency is one inference time instead of five; a real LEAP backend
+        # serializing on a single GPU context can leave the flag off
+        if leap_service.supports_parallel:
+            with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+                futures = [pool.submit(leap_service.analyze_image, frame_image, prompt)
+                           for prompt in prompts]
+                step_outputs = [future.result() for future in futures]
+        else:
+            step_outputs = [leap_service.analyze_image(frame_image, prompt)
+                            for prompt in prompts]
+
+        for i, (prompt, (response, inference_time)) in enumerate(zip(prompts, step_outputs)):
             print(f"\nStep {i+1}/5: {prompt}")
-            
-            response, inference_time = leap_service.analyze_image(frame_path, prompt)
+
             analysis_type = ContextInterpreter.get_analysis_type(response)
             question_data = QuestionGenerator.generate_question(analysis_type)
             
@@ -200,27 +375,20 @@ def run_progressive_analysis_test():
             if question_data:
                 print(f"❓ Generated question: {question_data['question']}")
                 print(f"   Options: {', '.join(question_data['options'])}")
-        
-        results.append(frame_results)
-    
-    # Save results to JSON for analysis
-    results_file = "simspec_test_results.json"
-    with open(results_file, 'w') as f:
-        json.dump({
-            'model_load_time_s': leap_service.model_load_time,
-            'total_frames_analyzed': len(frame_files),
-            'prompts_per_frame': len(prompts),
-            'results': results
-        }, f, indent=2)
-    
+
+        results_out.write(json.dumps(frame_results) + '\n')
+        frames_analyzed += 1
+
+    results_out.close()
+
     print(f"\n📊 Test Results Summary")
     print("=" * 30)
     print(f"Model load time: {leap_service.model_load_time:.2f}s")
-    print(f"Frames analyzed: {len(frame_files)}")
-    print(f"Total analyses: {len(frame_files) * len(prompts)}")
+    print(f"Frames analyzed: {frames_analyzed}")
+    print(f"Total analyses: {frames_analyzed * len(prompts)}")
     print(f"Results saved to: {results_file}")
-    
-    return results
+
+    return frames_analyzed
 
 if __name__ == "__main__":
     run_progressive_analysis_test()
\ No newline at end of file